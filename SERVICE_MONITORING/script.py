@@ -12,6 +12,10 @@ from datetime import datetime, timedelta
 HOME_DIR = os.path.dirname(os.path.abspath(__file__))
 LOG_DIR = os.path.join(HOME_DIR, "logs")
 LOCK_DIR = os.path.join(HOME_DIR, "locks")
+UTILS_DIR = os.path.join(HOME_DIR, "../UTILS")
+
+sys.path.insert(0, UTILS_DIR)
+import tsstore
 
 # Ensure logs directory exists
 os.makedirs(LOG_DIR, exist_ok=True)
@@ -47,6 +51,29 @@ def purge_old_logs(log_dir, retention_days):
                 except Exception as e:
                     logging.error(f"Error purging log file {file_path}: {e}")
 
+def record_history(config, kind, bankname, server, samples, variants=None):
+    """Record values in the local time-series store."""
+    store_config = config.get("timeseries_store") or {}
+    if not store_config.get("enabled"):
+        return
+    try:
+        store_dir = store_config.get("path", os.path.join(HOME_DIR, "../STORE"))
+        written = tsstore.append_samples(
+            store_dir, kind, bankname, server, samples,
+            keyframe_interval=store_config.get("keyframe_interval", tsstore.DEFAULT_KEYFRAME_INTERVAL),
+            variants=variants
+        )
+        logging.debug(f"Stored {written} {kind} records in {store_dir}")
+    except Exception as e:
+        logging.error(f"Error writing time-series store: {e}")
+
+def purge_history(config, kind):
+    """Apply retention_days to the local time-series store."""
+    store_config = config.get("timeseries_store") or {}
+    if store_config.get("enabled"):
+        tsstore.purge_old_days(store_config.get("path", os.path.join(HOME_DIR, "../STORE")), kind,
+                               store_config.get("retention_days", 180))
+
 def load_config(config_path):
     """Load configuration from YAML file."""
     try:
@@ -141,6 +168,8 @@ if __name__ == "__main__":
     retention_days = config.get("log_retention_days", 7)  # Default to 7 days
     purge_old_logs(LOG_DIR, retention_days)
 
+    purge_history(config, "service_status")
+
     # Check if function exists in the configuration
     if function_name not in config['functions']:
         logging.error(f"Function '{function_name}' not found in config.yaml.")
@@ -178,6 +207,8 @@ if __name__ == "__main__":
 
     # Prepare a batch payload for all services
     data_payload = ""
+    service_statuses = {}
+    service_variants = {}
 
     for service_name in service_names:
         # Get the patterns for the current service dynamically
@@ -204,6 +235,11 @@ if __name__ == "__main__":
             # Log the warning for missing patterns and treat the service as Down
             logging.warning(f"Missing pattern(s) for service {service_name}. Skipping.")
             data_payload += f"XYZ.ABC,host={server},service={service_name},status={service_status_text} {service_status}\n"
+            service_variants[service_name] = "nobank"
+
+        service_statuses[service_name] = service_status
+
+    record_history(config, "service_status", bankname, server, service_statuses, service_variants)
 
     # If there is any data to send, send it using the curl command
     if data_payload:
@@ -0,0 +1,430 @@
+import sys
+import os
+import time
+import json
+import mmap
+import array
+import argparse
+import subprocess
+import logging
+from fcntl import flock, LOCK_EX
+from datetime import datetime, timezone, timedelta
+
+# Compact on-disk history for the values the collectors send to Dynatrace.
+#
+# Layout: <store_dir>/<kind>/series.txt   one series key per line, id = line number
+#         <store_dir>/<kind>/YYYYMMDD.dat append-only records for one UTC day
+#         <store_dir>/<kind>/YYYYMMDD.idx last (ts, value) per series in that day
+#                                         file, so appends never rescan it
+#
+# A record is two native uint32 words: timestamp, (series_id << 16 | value).
+# Only change points are written, plus a keyframe every keyframe_interval seconds
+# and a MISSING marker when a series stops being reported, so steady values cost
+# a few hundred KB per day for all functions.
+
+MISSING = 0xFFFF
+MAX_SERIES = 0xFFFF
+DEFAULT_KEYFRAME_INTERVAL = 900
+# Concurrent cron runs may append a few seconds out of order
+CLOCK_SKEW = 300
+SEPARATOR = "|"
+# Dynatrace metrics ingest drops data points older than about an hour, so
+# export --send is limited to this window (with a margin for the request)
+INGEST_MAX_AGE = 3600 - 120
+
+# Dynatrace line formats used by the collectors, keyed by store kind and series
+# variant, so exported lines carry the same dimensions as the live ones
+LINE_FORMATS = {
+    "queue_depth": {
+        "": "XYZ.ABC,host={host},bankname={bankname},replica={value},queuename={name} {value} {ts_ms}",
+    },
+    "service_status": {
+        "": "XYZ.ABC,host={host},service={name},bankname={bankname},status={status} {value} {ts_ms}",
+        # Services with missing patterns are sent without the bankname dimension
+        "nobank": "XYZ.ABC,host={host},service={name},status={status} {value} {ts_ms}",
+    },
+}
+
+if array.array("I").itemsize != 4:
+    raise ImportError("tsstore requires a 4 byte unsigned int array type")
+
+
+def series_key(bankname, host, name, variant=""):
+    parts = [str(bankname), str(host), str(name)]
+    if variant:
+        parts.append(variant)
+    return SEPARATOR.join(parts)
+
+
+def split_series_key(key):
+    """Return (bankname, host, name, variant), variant "" for the default line format."""
+    parts = key.split(SEPARATOR)
+    if len(parts) == 4:
+        return tuple(parts)
+    return parts[0], parts[1], SEPARATOR.join(parts[2:]), ""
+
+
+def day_file(kind_dir, ts):
+    return os.path.join(kind_dir, datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d") + ".dat")
+
+
+def load_series(kind_dir):
+    """Return the list of series keys, index = series id."""
+    series_file = os.path.join(kind_dir, "series.txt")
+    if not os.path.isfile(series_file):
+        return []
+    with open(series_file, "r") as f:
+        return f.read().splitlines()
+
+
+def register_series(kind_dir, keys):
+    """Return {key: series_id}, appending unknown keys to series.txt."""
+    series_file = os.path.join(kind_dir, "series.txt")
+    with open(series_file, "a+") as f:
+        flock(f, LOCK_EX)
+        f.seek(0)
+        known = f.read().splitlines()
+        ids = {key: index for index, key in enumerate(known)}
+        for key in keys:
+            if key not in ids:
+                if len(ids) >= MAX_SERIES:
+                    raise ValueError(f"Series limit reached in {kind_dir}")
+                ids[key] = len(ids)
+                f.write(key + "\n")
+        f.flush()
+    return ids
+
+
+def read_records(path, start=None, end=None, first=0):
+    """
+    Return [(ts, series_id, value)] from a day file, memory-mapped.
+    start/end narrow the scan with a binary search on the timestamp column,
+    first skips records already seen.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) < 8:
+        return []
+
+    # Readers take no lock: a torn tail is ignored here and truncated by the next append
+    records = []
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size // 8 * 8
+        with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+            words = memoryview(mm).cast("I")
+            try:
+                count = len(words) // 2
+
+                if start is not None:
+                    low, high = first, count
+                    while low < high:
+                        middle = (low + high) // 2
+                        if words[2 * middle] < start - CLOCK_SKEW:
+                            low = middle + 1
+                        else:
+                            high = middle
+                    first = low
+
+                for index in range(first, count):
+                    ts = words[2 * index]
+                    if end is not None and ts > end + CLOCK_SKEW:
+                        break
+                    packed = words[2 * index + 1]
+                    records.append((ts, packed >> 16, packed & 0xFFFF))
+            finally:
+                words.release()
+    return records
+
+
+def load_index(path, record_count):
+    """
+    Return ({series_id: (ts, value)}, records_covered) from a day file's .idx
+    sidecar: word 0 is the record count it covers, then ts/value per series id
+    (ts 0 = not seen). A missing or inconsistent index covers nothing.
+    """
+    index_path = path[:-4] + ".idx"
+    if not os.path.isfile(index_path):
+        return {}, 0
+    words = array.array("I")
+    with open(index_path, "rb") as f:
+        data = f.read()
+    if len(data) < 4 or len(data) % 8 != 4:
+        return {}, 0
+    words.frombytes(data)
+    if words[0] > record_count:
+        return {}, 0
+    last = {
+        series_id: (words[1 + 2 * series_id], words[2 + 2 * series_id])
+        for series_id in range((len(words) - 1) // 2)
+        if words[1 + 2 * series_id]
+    }
+    return last, words[0]
+
+
+def save_index(path, last, record_count):
+    """Rewrite the .idx sidecar of a day file (caller holds the day file lock)."""
+    words = array.array("I", [0] * (1 + 2 * (max(last) + 1 if last else 0)))
+    words[0] = record_count
+    for series_id, (ts, value) in last.items():
+        words[1 + 2 * series_id] = ts
+        words[2 + 2 * series_id] = value
+    index_path = path[:-4] + ".idx"
+    with open(index_path + ".tmp", "wb") as f:
+        f.write(words.tobytes())
+    os.replace(index_path + ".tmp", index_path)
+
+
+def append_samples(store_dir, kind, bankname, host, samples, ts=None,
+                   keyframe_interval=DEFAULT_KEYFRAME_INTERVAL, variants=None):
+    """
+    Store one collection run: samples is {name: value} for every queue or
+    service reported for this bank/host. Series from the same bank/host that
+    are absent from samples are marked MISSING. variants maps a name to a
+    LINE_FORMATS variant when it was sent with a different dimension set.
+    """
+    variants = variants or {}
+    ts = int(ts if ts is not None else time.time())
+    kind_dir = os.path.join(store_dir, kind)
+    os.makedirs(kind_dir, exist_ok=True)
+
+    values = {
+        series_key(bankname, host, name, variants.get(name, "")): min(int(value), MISSING - 1)
+        for name, value in samples.items()
+    }
+    ids = register_series(kind_dir, values.keys())
+    prefix = series_key(bankname, host, "")
+    group_ids = {series_id for key, series_id in ids.items() if key.startswith(prefix)}
+
+    path = day_file(kind_dir, ts)
+    with open(path, "ab") as f:
+        flock(f, LOCK_EX)
+
+        # Drop a torn tail left by an interrupted write, otherwise every
+        # record appended after it would be misaligned
+        size = os.fstat(f.fileno()).st_size
+        if size % 8:
+            logging.warning(f"Truncating {size % 8} stray bytes at the end of {path}")
+            f.truncate(size - size % 8)
+        record_count = size // 8
+
+        # Last written (ts, value) per series today: the index, plus any
+        # records it does not cover yet (e.g. a writer died before saving it).
+        # An index covering more records than the file has is rebuilt.
+        last, covered = load_index(path, record_count)
+        for record_ts, series_id, value in read_records(path, first=covered):
+            last[series_id] = (record_ts, value)
+
+        out = array.array("I")
+        for key, value in values.items():
+            series_id = ids[key]
+            previous = last.get(series_id)
+            if previous is None or previous[1] != value or ts - previous[0] >= keyframe_interval:
+                out.extend((ts, series_id << 16 | value))
+
+        reported = {ids[key] for key in values}
+        for series_id, (record_ts, value) in list(last.items()):
+            if series_id in group_ids and series_id not in reported and value != MISSING:
+                out.extend((ts, series_id << 16 | MISSING))
+
+        if out:
+            f.write(out.tobytes())
+            f.flush()
+            for index in range(0, len(out), 2):
+                last[out[index + 1] >> 16] = (ts, out[index + 1] & 0xFFFF)
+        if out or covered != record_count:
+            save_index(path, last, record_count + len(out) // 2)
+    return len(out) // 2
+
+
+def query(store_dir, kind, start, end, bankname=None, host=None, name=None):
+    """
+    Return {series_key: [(ts, value)]} for start <= ts <= end, value None when
+    the series was not reported.
+    """
+    kind_dir = os.path.join(store_dir, kind)
+    series = load_series(kind_dir)
+    wanted = {}
+    for series_id, key in enumerate(series):
+        key_bankname, key_host, key_name, _ = split_series_key(key)
+        if bankname is not None and key_bankname != bankname:
+            continue
+        if host is not None and key_host != host:
+            continue
+        if name is not None and key_name != name:
+            continue
+        wanted[series_id] = key
+
+    result = {key: [] for key in wanted.values()}
+    if not wanted:
+        return result
+
+    day = datetime.fromtimestamp(start, timezone.utc).date()
+    last_day = datetime.fromtimestamp(end, timezone.utc).date()
+    while day <= last_day:
+        path = os.path.join(kind_dir, day.strftime("%Y%m%d") + ".dat")
+        for ts, series_id, value in read_records(path, start, end):
+            if series_id in wanted and start <= ts <= end:
+                result[wanted[series_id]].append((ts, None if value == MISSING else value))
+        day += timedelta(days=1)
+
+    for points in result.values():
+        points.sort()
+    return result
+
+
+def expand_points(points, start, end, step, max_gap):
+    """
+    Turn change points into one (ts, value) per step. A step gets no value when
+    the series was MISSING or nothing was stored for more than max_gap seconds.
+    """
+    expanded = []
+    index = 0
+    current = None
+    for ts in range(-(-start // step) * step, end + 1, step):
+        while index < len(points) and points[index][0] <= ts:
+            current = points[index]
+            index += 1
+        if current is not None and current[1] is not None and ts - current[0] <= max_gap:
+            expanded.append((ts, current[1]))
+    return expanded
+
+
+def format_lines(kind, key, points):
+    """Render points as Dynatrace metric lines with explicit timestamps."""
+    bankname, host, name, variant = split_series_key(key)
+    return [
+        LINE_FORMATS[kind][variant].format(
+            host=host, bankname=bankname, name=name, value=value,
+            status="Up" if value else "Down", ts_ms=ts * 1000,
+        )
+        for ts, value in points
+    ]
+
+
+def purge_old_days(store_dir, kind, retention_days):
+    """Remove day files older than retention_days."""
+    kind_dir = os.path.join(store_dir, kind)
+    if not os.path.isdir(kind_dir):
+        return
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y%m%d")
+    for file_name in os.listdir(kind_dir):
+        if file_name.endswith((".dat", ".idx")) and file_name[:-4] < cutoff:
+            try:
+                os.remove(os.path.join(kind_dir, file_name))
+                logging.info(f"Purged old store file: {file_name}")
+            except Exception as e:
+                logging.error(f"Error purging store file {file_name}: {e}")
+
+
+def send_lines(env_uri, api_token, lines, batch_size=1000):
+    """
+    POST metric lines to Dynatrace in batches, the payload goes through stdin.
+    Returns False as soon as a batch fails or has invalid lines.
+    """
+    for offset in range(0, len(lines), batch_size):
+        command = [
+            "curl", "-k", "-sS", "-X", "POST", env_uri, "-w", "\n%{http_code}",
+            "-H", "accept: application/json; charset=utf-8",
+            "-H", f"Authorization: Api-Token {api_token}",
+            "-H", "Content-Type: text/plain; charset=utf-8",
+            "--data-binary", "@-",
+            "--connect-timeout", "10", "--max-time", "60",
+        ]
+        result = subprocess.run(
+            command,
+            input="\n".join(lines[offset:offset + batch_size]),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            universal_newlines=True
+        )
+        if result.returncode != 0:
+            logging.error(f"Curl error: {result.stderr}")
+            return False
+
+        body, _, status_code = result.stdout.rpartition("\n")
+        logging.info(f"Curl response ({status_code}): {body}")
+        if not status_code.startswith("2"):
+            logging.error(f"Dynatrace rejected batch at line {offset} with HTTP {status_code}")
+            return False
+        try:
+            response = json.loads(body) if body.strip() else {}
+        except ValueError:
+            response = {}
+        if response.get("linesInvalid") or response.get("error"):
+            logging.error(f"Dynatrace rejected lines in batch at line {offset}: {body}")
+            return False
+    return True
+
+
+def parse_time(value):
+    """Accept epoch seconds or an ISO 8601 date/time (UTC when no offset)."""
+    try:
+        return int(float(value))
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query or export the collector time-series store.")
+    parser.add_argument("command", choices=["query", "export"])
+    parser.add_argument("store_dir")
+    parser.add_argument("kind", choices=sorted(LINE_FORMATS))
+    parser.add_argument("--bank")
+    parser.add_argument("--host")
+    parser.add_argument("--name", help="queue name or service name")
+    parser.add_argument("--start", help="epoch or ISO time, default: 24h before --end")
+    parser.add_argument("--end", help="epoch or ISO time, default: now")
+    parser.add_argument("--step", type=int, default=60, help="export: seconds between exported points")
+    parser.add_argument("--max-gap", type=int, default=DEFAULT_KEYFRAME_INTERVAL + 60,
+                        help="export: treat series as unreported after this many seconds without a record")
+    parser.add_argument("--send", metavar="CONFIG",
+                        help="export: POST to ENV_URI/Api_Token from this config.yaml "
+                             "(only the last hour, older points are rejected by Dynatrace)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format="%(asctime)s - %(levelname)s - %(message)s")
+
+    end = parse_time(args.end) if args.end else int(time.time())
+    start = parse_time(args.start) if args.start else end - 86400
+
+    if args.command == "query":
+        result = query(args.store_dir, args.kind, start, end, args.bank, args.host, args.name)
+        for key, points in sorted(result.items()):
+            bankname, host, name, _ = split_series_key(key)
+            for ts, value in points:
+                stamp = datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                print(f"{stamp} {bankname} {host} {name} {'-' if value is None else value}")
+        return 0
+
+    if args.send:
+        oldest = int(time.time()) - INGEST_MAX_AGE
+        if end < oldest:
+            logging.error("Dynatrace only ingests data points from the last hour; "
+                          "export without --send to keep older history as a file.")
+            return 1
+        if start < oldest:
+            logging.warning(f"Clamping --start to {oldest}: Dynatrace rejects data points older than an hour.")
+            start = oldest
+
+    # Look back far enough to know the value in effect at --start
+    result = query(args.store_dir, args.kind, start - args.max_gap, end, args.bank, args.host, args.name)
+    lines = []
+    for key, points in sorted(result.items()):
+        lines.extend(format_lines(args.kind, key, expand_points(points, start, end, args.step, args.max_gap)))
+
+    if not args.send:
+        for line in lines:
+            print(line)
+        return 0
+
+    import yaml
+    with open(args.send, "r") as file:
+        config = yaml.safe_load(file)
+    logging.info(f"Sending {len(lines)} lines to {config['ENV_URI']}")
+    return 0 if send_lines(config["ENV_URI"], config["Api_Token"], lines) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
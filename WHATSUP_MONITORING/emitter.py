@@ -0,0 +1,144 @@
+import sys
+import os
+import json
+import time
+import re
+import logging
+
+# Remote-side companion for script.py --stream.
+# Watches QUEUE_DEPTH_MONITORING_DT/<bank>/bc.txt and writes one JSON line per
+# change to stdout, so the collector can read it over a single ssh session
+# instead of polling the file from cron. A full snapshot is repeated every
+# heartbeat seconds so steady queues keep reaching Dynatrace; changes are only
+# read once the file has been stable for one extra check.
+#
+# Usage: python3 emitter.py <path/to/bc.txt> [interval_seconds] [heartbeat_seconds]
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_HEARTBEAT = 60
+
+# Same escape sequence the collector strips with sed after `cat -A`
+ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9][a-zA-Z]\x1b\[[0-9];[0-9][0-9]m")
+QUEUE_PATTERN = re.compile(r"[A-Z]*.[0-9].[0-9][0-9]")
+
+# Setup logging (stdout is the data channel, so log to stderr)
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        stream=sys.stderr,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+
+# Parse raw bc.txt content into {queuename: replica}
+def parse_raw_content(content):
+    """
+    Python equivalent of the collector's
+    `cat -A | sed | grep | cut -d '.' -f 1 | uniq -c | tail -n +2` pipeline
+    """
+    groups = []
+    for line in content.splitlines():
+        # Render the line the way `cat -A` does before the sed/grep stages
+        line = ESCAPE_PATTERN.sub(" ", line)
+        line = line.replace("\t", "^I").replace("\x1b", "^[") + "$"
+        if not QUEUE_PATTERN.search(line):
+            continue
+        key = line.split(".", 1)[0]
+        if groups and groups[-1][0] == key:
+            groups[-1][1] += 1
+        else:
+            groups.append([key, 1])
+
+    queue_data = {}
+    for key, count in groups[1:]:
+        columns = key.split()
+        if columns:
+            queue_data[columns[0]] = str(count)
+    return queue_data
+
+# Work out what changed between two parsed snapshots
+def diff_queue_data(previous, current):
+    changed = {queue: replica for queue, replica in current.items() if previous.get(queue) != replica}
+    removed = sorted(queue for queue in previous if queue not in current)
+    return changed, removed
+
+# Write one message to the stream
+def emit(message):
+    sys.stdout.write(json.dumps(message, sort_keys=True) + "\n")
+    sys.stdout.flush()
+
+# Stat signature of the input file, None when it does not exist
+def file_signature(input_file):
+    try:
+        stat = os.stat(input_file)
+        return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+# Watch the input file and emit deltas until the stream is closed
+def watch(input_file, interval, heartbeat):
+    last_signature = None
+    pending_signature = None
+    queue_data = None
+    last_emit = 0
+
+    while True:
+        signature = file_signature(input_file)
+
+        # Only act on a change once it has been stable for one extra check,
+        # so a half-rewritten bc.txt does not look like every queue going away
+        if signature != last_signature:
+            if signature != pending_signature:
+                pending_signature = signature
+            elif signature is None:
+                # File gone: report everything removed once, then stay quiet until it returns
+                if queue_data is not None:
+                    logging.warning(f"Input file {input_file} disappeared")
+                    emit({"ts": time.time(), "snapshot": True, "set": {}, "removed": []})
+                    last_emit = time.time()
+                queue_data = None
+                last_signature = None
+            else:
+                try:
+                    with open(input_file, "r", errors="replace") as f:
+                        current = parse_raw_content(f.read())
+                except OSError as e:
+                    logging.error(f"Error reading input file {input_file}: {e}")
+                    current = None
+
+                # Changed again while we were reading: wait for it to settle
+                if current is not None and file_signature(input_file) == signature:
+                    last_signature = signature
+                    if queue_data is None:
+                        emit({"ts": time.time(), "snapshot": True, "set": current, "removed": []})
+                        last_emit = time.time()
+                    else:
+                        changed, removed = diff_queue_data(queue_data, current)
+                        if changed or removed:
+                            emit({"ts": time.time(), "snapshot": False, "set": changed, "removed": removed})
+                            last_emit = time.time()
+                    queue_data = current
+
+        # Heartbeat: resend the whole state even when nothing changed
+        if queue_data is not None and time.time() - last_emit >= heartbeat:
+            emit({"ts": time.time(), "snapshot": True, "set": queue_data, "removed": []})
+            last_emit = time.time()
+
+        time.sleep(interval)
+
+if __name__ == "__main__":
+    setup_logging()
+
+    if len(sys.argv) < 2:
+        logging.error("Please specify the input file to watch as an argument.")
+        sys.exit(1)
+
+    input_file = sys.argv[1]
+    interval = float(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_INTERVAL
+    heartbeat = float(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_HEARTBEAT
+
+    logging.info(f"Watching {input_file} every {interval}s, heartbeat every {heartbeat}s")
+    try:
+        watch(input_file, interval, heartbeat)
+    except (BrokenPipeError, KeyboardInterrupt):
+        # Receiver went away; nothing left to do
+        sys.exit(0)
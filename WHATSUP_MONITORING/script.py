@@ -6,7 +6,7 @@ import yaml
 import logging
 from logging.handlers import TimedRotatingFileHandler
 from fcntl import flock, LOCK_EX, LOCK_NB
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import re
 
 # Define HOME_DIR as the script's working directory
@@ -17,6 +17,9 @@ INPUT_DIR = os.path.join(HOME_DIR, "input")
 OUTPUT_DIR = os.path.join(HOME_DIR, "outfile")
 UTILS_DIR = os.path.join(HOME_DIR, "../UTILS")
 
+sys.path.insert(0, UTILS_DIR)
+import tsstore
+
 # Ensure logs and lock directories exist
 os.makedirs(LOG_DIR, exist_ok=True)
 os.makedirs(LOCK_DIR, exist_ok=True)
@@ -51,6 +54,29 @@ def purge_old_logs(log_dir, retention_days):
                     logging.error(f"Error purging log file {file_path}: {e}")
 
 
+# Record values in the local time-series store
+def record_history(config, kind, bankname, server, samples, variants=None):
+    store_config = config.get("timeseries_store") or {}
+    if not store_config.get("enabled"):
+        return
+    try:
+        store_dir = store_config.get("path", os.path.join(HOME_DIR, "../STORE"))
+        written = tsstore.append_samples(
+            store_dir, kind, bankname, server, samples,
+            keyframe_interval=store_config.get("keyframe_interval", tsstore.DEFAULT_KEYFRAME_INTERVAL),
+            variants=variants
+        )
+        logging.debug(f"Stored {written} {kind} records in {store_dir}")
+    except Exception as e:
+        logging.error(f"Error writing time-series store: {e}")
+
+# Apply retention_days to the local time-series store
+def purge_history(config, kind):
+    store_config = config.get("timeseries_store") or {}
+    if store_config.get("enabled"):
+        tsstore.purge_old_days(store_config.get("path", os.path.join(HOME_DIR, "../STORE")), kind,
+                               store_config.get("retention_days", 180))
+
 def copy_input_file_from_remote(server_ip, username, remote_path, local_path):
     """
     Copy input file from remote server using ssh command and process it locally
@@ -104,6 +130,53 @@ def copy_input_file_from_remote(server_ip, username, remote_path, local_path):
         logging.error(f"Error copying or processing file from remote server: {e}")
         return False
 
+def stream_from_remote(stream_command, local_path, on_update):
+    """
+    Read emitter.py deltas from a long-lived stream and apply them to the local queue state
+    """
+    queue_data = {}
+    try:
+        logging.info(f"Starting stream command: {stream_command}")
+
+        process = subprocess.Popen(
+            stream_command,
+            shell=True,
+            stdout=subprocess.PIPE,
+            universal_newlines=True
+        )
+
+        for line in process.stdout:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logging.error(f"Skipping invalid stream message: {line.strip()}")
+                continue
+
+            if message.get("snapshot"):
+                queue_data = {}
+            for queuename in message.get("removed", []):
+                queue_data.pop(queuename, None)
+            for queuename, replica in message.get("set", {}).items():
+                queue_data[queuename] = {"replica": str(replica), "queuename": queuename}
+
+            logging.debug(f"Applied stream update: {message}")
+
+            # Keep the local file in the same `uniq -c` layout the polling path produces
+            with open(local_path, "w") as f:
+                for status in queue_data.values():
+                    f.write(f"{status['replica']:>7} {status['queuename']}\n")
+
+            # Also on an empty state, so removed queues reach the store
+            on_update(queue_data)
+
+        process.wait()
+        logging.error(f"Stream ended with return code {process.returncode}")
+        return False
+
+    except Exception as e:
+        logging.error(f"Error reading stream from remote server: {e}")
+        return False
+
 # Load configuration
 def load_config(config_path):
     try:
@@ -175,6 +248,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     function_name = sys.argv[1]
+    stream_mode = "--stream" in sys.argv[2:]
 
     LOCK_FILE = os.path.join(LOCK_DIR, f"{function_name}.lock")
     lock_file = ensure_single_instance(LOCK_FILE)
@@ -187,6 +261,8 @@ if __name__ == "__main__":
     retention_days = config.get("log_retention_days", 7)
     purge_old_logs(LOG_DIR, retention_days)
 
+    purge_history(config, "queue_depth")
+
     # Check if 'functions' key exists and the function_name is in it
     if 'functions' not in config or function_name not in config['functions']:
         logging.error(f"Function '{function_name}' not found in config.yaml.")
@@ -202,6 +278,42 @@ if __name__ == "__main__":
     env_uri = config["ENV_URI"]
     api_token = config["Api_Token"]
 
+    if stream_mode:
+        # Push mode: run emitter.py on the remote host and ingest each delta as it arrives.
+        # `--stream -` reads the emitter output from stdin instead (local testing).
+        stream_args = sys.argv[sys.argv.index("--stream") + 1:]
+        if stream_args and stream_args[0] == "-":
+            stream_command = "cat"
+        else:
+            remote_emitter = function_config.get("remote_emitter", config.get("remote_emitter"))
+            if not remote_emitter:
+                logging.error(f"'remote_emitter' is not set in config.yaml; cannot start --stream for '{function_name}'.")
+                sys.exit(1)
+            emitter_interval = function_config.get("emitter_interval", config.get("emitter_interval", 0.5))
+            emitter_heartbeat = function_config.get("emitter_heartbeat", config.get("emitter_heartbeat", 60))
+            stream_command = (
+                f"ssh -o ServerAliveInterval=15 -o ServerAliveCountMax=3 {username}@{server} "
+                f"\"python3 {remote_emitter} {remote_input_file} {emitter_interval} {emitter_heartbeat}\""
+            )
+
+        # A stream outlives the startup purge, so re-apply retention when the UTC day changes
+        purged_day = [datetime.now(timezone.utc).date()]
+
+        def on_update(queue_data):
+            if datetime.now(timezone.utc).date() != purged_day[0]:
+                purged_day[0] = datetime.now(timezone.utc).date()
+                purge_history(config, "queue_depth")
+            record_history(config, "queue_depth", bankname, server,
+                           {queue: status["replica"] for queue, status in queue_data.items()})
+            if queue_data:
+                send_to_dynatrace(queue_data, env_uri, api_token, server, bankname)
+            else:
+                logging.error("No valid queue data found to send to Dynatrace")
+
+        stream_from_remote(stream_command, input_file, on_update)
+        lock_file.close()
+        sys.exit(1)
+
     # Copy input file from remote server
     if not copy_input_file_from_remote(server, username, remote_input_file, input_file):
         logging.error("Failed to copy input file from remote server")
@@ -209,6 +321,8 @@ if __name__ == "__main__":
 
     # Parse input file and get queue data
     queue_data = parse_input_file(input_file)
+    record_history(config, "queue_depth", bankname, server,
+                   {queue: status["replica"] for queue, status in queue_data.items()})
     if queue_data:
         send_to_dynatrace(queue_data, env_uri, api_token, server, bankname)
     else:
@@ -14,7 +14,7 @@ UTILS_FILE = os.path.join(HOME_DIR, "../UTILS/utils.yaml")
 
 # List of required Python modules
 REQUIRED_MODULES = [
-    "subprocess", "json", "sys", "os", "yaml", "logging", "datetime", "re", "fcntl"
+    "subprocess", "json", "sys", "os", "yaml", "logging", "datetime", "re", "fcntl", "mmap", "array"
 ]
 
 # List of required external commands